@@ -0,0 +1,172 @@
+import asyncio
+import functools
+from lxml import etree
+
+
+class AsyncEtreeModel(object):
+    """
+    asyncio facade for an EtreeModel, for pipelines that drive the model without a view.
+
+    the event loop must run in the model's thread (e.g. a Qt-compatible loop such as qasync's QEventLoop, or a plain
+    asyncio loop with the offscreen platform). parsing and serialization run in an executor, so many documents can
+    overlap their I/O without blocking each other. mutations are queued and applied together on the loop thread, and
+    held back while a save is serializing the document. consecutive pasteElements/addChildElement calls on the same
+    index are combined into one insert; every other call still makes its own model changes and signals.
+    """
+    def __init__(self, model, loop=None, executor=None):
+        super(AsyncEtreeModel, self).__init__()
+        self._model = model
+        self._loop = loop
+        self._executor = executor
+        self._pending = []
+        self._flushScheduled = False
+        self._saving = 0                # number of saves serializing the document
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def loop(self):
+        """
+        the loop given to the constructor, or else the running loop
+        :return:
+        """
+        if self._loop is None:
+            return asyncio.get_running_loop()
+        return self._loop
+
+    async def load(self, source, parser=None):
+        """
+        parses source in the executor and makes it the root of the model
+        :param source: filename, file object or url accepted by etree.parse
+        :param parser: optional etree.XMLParser
+        :return: the new root etree.Element
+        """
+        tree = await self.loop.run_in_executor(self._executor, functools.partial(etree.parse, source, parser))
+        await self.flush()
+        root = tree.getroot()
+        self._model.setXMLRoot(root)
+        return root
+
+    async def save(self, target=None, **kwargs):
+        """
+        serializes the model's document in the executor. mutations queued while it is serializing are held back until
+        it is done, so they don't race with the serializer.
+        :param target: optional filename or file object to write to
+        :param kwargs: passed on to etree.tostring
+        :return: the serialized document as bytes
+        """
+        await self.flush()
+        root = self._model.getXMLRoot()
+        self._saving += 1
+        try:
+            data = await self.loop.run_in_executor(self._executor, functools.partial(etree.tostring, root, **kwargs))
+        finally:
+            self._saving -= 1
+            self._schedule()
+        if target is not None:
+            await self.loop.run_in_executor(self._executor, self._write, target, data)
+        return data
+
+    async def xpath(self, expression, **kwargs):
+        """
+        evaluates an xpath expression on the model's document, after any queued mutations have been applied
+        :param expression: string
+        :param kwargs: passed on to etree._Element.xpath (namespaces, variables)
+        :return: the result of the xpath evaluation
+        """
+        await self.flush()
+        return self._model.getXMLRoot().xpath(expression, **kwargs)
+
+    def mutate(self, func, *args, **kwargs):
+        """
+        queues a call to func (usually an EtreeModel method) to be applied on the loop thread with the next batch.
+        needs the loop given to the constructor, or a running loop.
+        :param func: callable
+        :return: future for the return value of func
+        """
+        future = self.loop.create_future()
+        self._pending.append((future, func, args, kwargs))
+        self._schedule()
+        return future
+
+    async def mutateMany(self, calls):
+        """
+        queues several calls at once, they are applied in the same batch
+        :param calls: iterable of (func, args) or (func, args, kwargs) tuples
+        :return: list of the return values
+        """
+        futures = [self.mutate(call[0], *call[1], **(call[2] if len(call) > 2 else {})) for call in calls]
+        return await asyncio.gather(*futures)
+
+    async def flush(self):
+        """
+        waits until every queued mutation has been applied
+        :return:
+        """
+        if self._pending:
+            await asyncio.gather(*[pending[0] for pending in self._pending], return_exceptions=True)
+
+    def _schedule(self):
+        if self._pending and not self._saving and not self._flushScheduled:
+            self._flushScheduled = True
+            self.loop.call_soon(self._applyPending)
+
+    def _applyPending(self):
+        self._flushScheduled = False
+        if self._saving:
+            return                                      # the save schedules the batch again when it is done
+        pending = [call for call in self._pending if not call[0].cancelled()]
+        self._pending = []
+        for futures, func, args, kwargs in self._coalesce(pending):
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future in futures:
+                    future.set_result(result)
+
+    def _coalesce(self, pending):
+        """
+        combines consecutive pasteElements/addChildElement calls on the same index into one pasteElements call, so the
+        model inserts their rows at once
+        :param pending: list of (future, func, args, kwargs)
+        :return: list of (futures, func, args, kwargs)
+        """
+        calls = []
+        insert = None                                   # the combined insert the next call can join
+        for future, func, args, kwargs in pending:
+            elements = self._insertedElements(func, args, kwargs)
+            if elements is None:
+                calls.append(([future], func, args, kwargs))
+                insert = None
+            elif insert is not None and insert[2][0] == args[0]:
+                insert[0].append(future)
+                insert[2][1].extend(elements)
+            else:
+                insert = ([future], self._model.pasteElements, (args[0], elements), {})
+                calls.append(insert)
+        return calls
+
+    def _insertedElements(self, func, args, kwargs):
+        """
+        :return: list of the elements func would append to args[0], or None if it is not an insert that can be combined
+        """
+        if kwargs:
+            return None
+        if func == self._model.pasteElements and len(args) == 2:
+            return list(args[1])
+        if func == self._model.addChildElement and len(args) == 1:
+            return [etree.Element('NewElement')]
+        return None
+
+    @staticmethod
+    def _write(target, data):
+        if hasattr(target, 'write'):
+            target.write(data)
+        else:
+            with open(target, 'wb') as f:
+                f.write(data)
@@ -1,7 +1,14 @@
+import sys
+from collections import OrderedDict
 import pyqtgraph as pg
 from lxml import etree
 
 
+# display strings for element tags, keyed by (Clark tag, prefix). documents usually have far fewer distinct tags
+# than elements, so all the elements with the same tag share one string.
+_displayTags = {}
+
+
 class Node(object):
     def __init__(self, parent=None):
         super(Node, self).__init__()
@@ -58,7 +65,10 @@ class Node(object):
 
     def row(self):
         if self._parent is not None:
-            return self._parent._children.index(self)
+            return self._parent.childRow(self)
+
+    def childRow(self, child):
+        return self._children.index(child)
 
     def data(self, column, role):
         return None
@@ -134,14 +144,220 @@ class AttributeHeaderNode(HeaderNode):
 
 
 class ChildrenHeaderNode(HeaderNode):
+    """
+    header for the child elements. the rows come straight from the etree; the ElementNodes for them are built a page
+    at a time when they are needed, and only the most recently used pages are kept. nodes the model has handed out
+    as a parent (see pin) are kept until they are evicted while no persistent index refers to them.
+    """
+    pageSize = 500              # number of child nodes built at a time
+    maxPages = 4                # number of pages kept built
+    _childFlags = {}            # column -> flags of the child ElementNodes, they only depend on the column
 
     def __init__(self, parent=None):
         super(ChildrenHeaderNode, self).__init__(text='Children:', parent=parent)
+        self._count = None              # number of child elements, counted once. lxml walks the children for len()
+        self._anchors = {}              # page -> first element of the page, to walk the siblings from
+        self._pages = OrderedDict()     # page -> list of ElementNodes
+        self._pinned = {}               # row -> pinned ElementNode
+        self._rows = {}                 # built ElementNode -> row
 
-        if parent is not None:
-            for child in self.element:
-                chn = ElementNode(child, parent=None)
-                Node.addChild(self, chn)
+    @property
+    def children(self):
+        return [self.child(row) for row in range(self.childCount())]
+
+    @property
+    def loadedCount(self):
+        """
+        number of child ElementNodes currently built
+        :return:
+        """
+        return len(self._rows)
+
+    def child(self, row):
+        if not 0 <= row < self.childCount():
+            return None
+        page = row // self.pageSize
+        if page in self._pages:
+            self._pages.move_to_end(page)
+        else:
+            self._buildPage(page)
+        return self._pages[page][row - page * self.pageSize]
+
+    def childCount(self):
+        if self.element is None:
+            return 0
+        if self._count is None:
+            self._count = len(self.element)
+        return self._count
+
+    def childRow(self, child):
+        row = self._rows.get(child)
+        if row is None:
+            row = self.element.index(child.element)
+        return row
+
+    def childFlags(self, column):
+        """
+        returns the flags of the child ElementNodes, without building them
+        :param column: int
+        :return:
+        """
+        flags = self._childFlags.get(column)
+        if flags is None:
+            flags = self._childFlags[column] = Node.flags(self, column)
+        return flags
+
+    def _elementAt(self, row):
+        """
+        returns the child element at row, walking the siblings from the nearest page anchor before it
+        :param row: int
+        :return: etree.Element
+        """
+        page = row // self.pageSize
+        anchor = max((p for p in self._anchors if p <= page), default=None)
+        if anchor is None:
+            anchor = 0
+            self._anchors[0] = next(self.element.iterchildren())
+        element = self._anchors[anchor]
+        position = anchor * self.pageSize
+        if position < row:
+            for position, element in enumerate(element.itersiblings(), position + 1):
+                if position % self.pageSize == 0:
+                    self._anchors[position // self.pageSize] = element
+                if position == row:
+                    break
+        return element
+
+    def _buildPage(self, page):
+        """
+        builds the ElementNodes for one page of child elements, and drops the least recently used page if there are
+        too many
+        :param page: page number
+        :return:
+        """
+        nodes = []
+        start = page * self.pageSize
+        element = self._elementAt(start)
+        for row in range(start, min(start + self.pageSize, self.childCount())):
+            node = self._pinned.get(row)
+            if node is None:
+                node = ElementNode(element, parent=None)
+                node.setParent(self)
+                self._rows[node] = row
+            nodes.append(node)
+            element = element.getnext()
+        if element is not None:
+            self._anchors[page + 1] = element
+        self._pages[page] = nodes
+        while len(self._pages) > self.maxPages:
+            self._dropPage(self._pages.popitem(last=False)[1])
+
+    def _dropPage(self, nodes):
+        for node in nodes:
+            row = self._rows.get(node)
+            if self._pinned.get(row) is not node:
+                self._rows.pop(node, None)
+
+    def _moveRows(self, first, delta):
+        """
+        updates the bookkeeping after rows were inserted (delta > 0) or removed (delta < 0) in the etree. rows from
+        first on have moved by delta.
+        :param first: int
+        :param delta: int
+        :return:
+        """
+        changed = min(first, first + delta)
+        self._count += delta
+        for page in [page for page in self._anchors if page * self.pageSize >= changed]:
+            del self._anchors[page]
+        for page in [page for page in self._pages if (page + 1) * self.pageSize > changed]:
+            self._dropPage(self._pages.pop(page))
+        self._pinned = dict((row + delta if row >= first else row, node) for row, node in self._pinned.items())
+        for row, node in self._pinned.items():
+            self._rows[node] = row
+
+    def pin(self, child):
+        """
+        keeps child built even when its page is dropped. the model pins the nodes it uses in QModelIndexes, so they
+        stay alive as long as the view may hold those indexes.
+        :param child: ElementNode
+        :return:
+        """
+        self._pinned[self.childRow(child)] = child
+
+    def unpin(self, child):
+        """
+        lets child be dropped with its page again
+        :param child: ElementNode
+        :return:
+        """
+        row = self._rows.get(child)
+        if row is not None and self._pinned.get(row) is child:
+            del self._pinned[row]
+            if row // self.pageSize not in self._pages:
+                del self._rows[child]
+
+    def pinnedChild(self, row):
+        """
+        returns the pinned node at row, or None
+        :param row: int
+        :return: ElementNode
+        """
+        return self._pinned.get(row)
+
+    def evict(self, inUse):
+        """
+        drops all the pages of child nodes, and the pinned nodes that are not in inUse. the children of the pinned
+        nodes that are kept are evicted in turn.
+        :param inUse: set of nodes that must stay built
+        :return:
+        """
+        self._pages.clear()
+        for row, node in list(self._pinned.items()):
+            if node in inUse:
+                node.childrenHeader().evict(inUse)
+            else:
+                del self._pinned[row]
+        self._rows = dict((node, row) for row, node in self._pinned.items())
+
+    def insertChildElement(self, position, element):
+        """
+        inserts element into the etree at position
+        :param position: int
+        :param element: etree.Element
+        :return:
+        """
+        self.insertChildElements(position, [element])
+
+    def insertChildElements(self, position, elements):
+        """
+        inserts elements into the etree at position, without building nodes for them
+        :param position: int
+        :param elements: list of etree.Element
+        :return:
+        """
+        if position < self.childCount():
+            anchor = self._elementAt(position)
+            for element in elements:
+                anchor.addprevious(element)
+        else:
+            self.element.extend(elements)
+        self._moveRows(position, len(elements))
+
+    def removeChildElement(self, position):
+        """
+        removes the child element at position from the etree
+        :param position: int
+        :return:
+        """
+        if not 0 <= position < self.childCount():
+            return
+        node = self._pinned.pop(position, None)
+        if node is not None:
+            node.setParent(None)
+            self._rows.pop(node, None)
+        self.element.remove(self._elementAt(position))
+        self._moveRows(position + 1, -1)
 
 
 class AttributeNode(Node):
@@ -282,14 +498,55 @@ class ElementNode(Node):
         """
         return self._parent.element.index(self._element)
 
+    def displayTag(self):
+        """
+        returns the tag of the element as prefix:local, using the prefix from the element's nsmap
+        :return: string
+        """
+        tag = self.element.tag
+        if not isinstance(tag, str):                    # comments and processing instructions
+            return tag
+        prefix = self.element.prefix
+        key = (tag, prefix)
+        display = _displayTags.get(key)
+        if display is None:
+            local = etree.QName(tag).localname
+            if prefix:
+                local = prefix + ':' + local
+            display = _displayTags[key] = sys.intern(local)
+        return display
+
+    def resolveTag(self, name):
+        """
+        converts a prefix:local name to the {uri}local form, using the element's nsmap. names without a prefix
+        go in the default namespace, and names already in {uri}local form are returned unchanged.
+        :param name: string
+        :return: string, or None if the prefix is not in the nsmap
+        """
+        if name.startswith('{'):
+            return name
+        prefix, sep, local = name.rpartition(':')
+        uri = self.element.nsmap.get(prefix or None)
+        if uri is None:
+            if prefix:
+                return None
+            return local
+        return '{%s}%s' % (uri, local)
+
     def data(self, column, role):
         if role == pg.QtCore.Qt.DisplayRole:
             if column == 0:
-                return self.element.tag
+                return self.displayTag()
 
     def setData(self, column, value):
         if column == 0:
-            self.element.tag = value
+            tag = self.resolveTag(value)
+            if tag is None:
+                return False
+            try:
+                self.element.tag = tag
+            except ValueError:                          # not a valid tag name
+                return False
             return True
         return False
 
@@ -315,8 +572,10 @@ class ElementNode(Node):
         """
         if not isinstance(element, etree._Element):
             element = etree.Element('NewElement')
-        self.element.append(element)                    # add the element to the etree
-        return ElementNode(element, parent=self)        # create a node for it
+        header = self.childrenHeader()
+        position = header.childCount()
+        header.insertChildElement(position, element)    # add the element to the etree
+        return header.child(position)                   # the header builds the node for it
 
     def removeChildElement(self, position):
         """
@@ -332,6 +591,16 @@ class ElementNode(Node):
         # remove child node
         self.removeChild(position)
 
+    def childrenHeader(self):
+        """
+        returns the ChildrenHeaderNode holding the nodes for the child elements
+        :return: ChildrenHeaderNode
+        """
+        for child in self._children:
+            if isinstance(child, ChildrenHeaderNode):
+                return child
+        return None
+
     def attributeNodeByKey(self, key):
         node = None
         for child in self._children:
@@ -1,11 +1,13 @@
+import copy
 from pyqtgraph import QtCore
 from lxml import etree
-from .Data import ElementNode, Node
+from .Data import ElementNode, Node, ChildrenHeaderNode
 
 
 class EtreeModel(QtCore.QAbstractItemModel):
     sortRole = QtCore.Qt.UserRole
     filterRole = QtCore.Qt.UserRole + 1
+    elementMimeType = 'application/x-pyqtetreemodel-xml'
 
     def __init__(self, root, parent=None):
         super(EtreeModel, self).__init__(parent)
@@ -15,27 +17,26 @@ class EtreeModel(QtCore.QAbstractItemModel):
         self._rootNode.addChild(ElementNode(root))
 
     def rowCount(self, parent):
-        if parent.isValid():
-            parentNode = parent.internalPointer()
-        else:
-            parentNode = self._rootNode
-
-        return parentNode.childCount()
+        if parent.column() > 0:
+            return 0
+        return self.getNode(parent).childCount()
 
     def columnCount(self, parent):
-        if parent.isValid():
-            parentNode = parent.internalPointer()
-        else:
-            parentNode = self._rootNode
+        return self.getNode(parent).columnCount()
 
-        return parentNode.columnCount()
+    def hasChildren(self, parent=QtCore.QModelIndex()):
+        if parent.column() > 0:
+            return False
+        if isinstance(parent.internalPointer(), ChildrenHeaderNode):
+            return True                             # element nodes always have header rows, don't build the node
+        return self.getNode(parent).childCount() > 0
 
     def data(self, index, role):
 
         if not index.isValid():
             return None
 
-        node = index.internalPointer()
+        node = self.getNode(index)
 
         return node.data(index.column(), role)
 
@@ -43,7 +44,7 @@ class EtreeModel(QtCore.QAbstractItemModel):
 
         if index.isValid():
 
-            node = index.internalPointer()
+            node = self.getNode(index)
 
             if role == QtCore.Qt.EditRole:
                 if node.setData(index.column(), value):
@@ -59,33 +60,47 @@ class EtreeModel(QtCore.QAbstractItemModel):
                 return ""
 
     def flags(self, index):
-        if index.isValid():
-            node = index.internalPointer()
-        else:
-            node = self._rootNode
-        return node.flags(index.column())
+        parentNode = index.internalPointer()
+        if isinstance(parentNode, ChildrenHeaderNode):
+            return parentNode.childFlags(index.column())                # the view asks for every row
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+        return self.getNode(index).flags(index.column())
 
     def parent(self, index):
 
-        node = self.getNode(index)
-        parentNode = node.parent()
+        if not index.isValid():
+            return QtCore.QModelIndex()
 
-        if parentNode == self._rootNode:
+        parentNode = index.internalPointer()
+
+        if parentNode is self._rootNode:
             return QtCore.QModelIndex()
 
-        return self.createIndex(parentNode.row(), 0, parentNode)
+        return self._createIndex(parentNode.row(), 0, parentNode.parent())
 
     def index(self, row, column, parent=QtCore.QModelIndex()):
 
         parentNode = self.getNode(parent)
 
-        childItem = parentNode.child(row)
-
-        if childItem:
-            return self.createIndex(row, column, childItem)
+        if 0 <= row < parentNode.childCount():
+            return self._createIndex(row, column, parentNode)
         else:
             return QtCore.QModelIndex()
 
+    def _createIndex(self, row, column, parentNode):
+        """
+        indexes point to the parent of the node they reference, so the children of a ChildrenHeaderNode can have
+        indexes without their nodes being built. the parent is pinned to keep it alive while the view holds the index.
+        :param row: int
+        :param column: int
+        :param parentNode: Node
+        :return: QModelIndex
+        """
+        if isinstance(parentNode.parent(), ChildrenHeaderNode):
+            parentNode.parent().pin(parentNode)
+        return self.createIndex(row, column, parentNode)
+
     def insertRows(self, position, rows, parent=QtCore.QModelIndex()):
         success = False
         parentNode = self.getNode(parent)
@@ -153,7 +168,9 @@ class EtreeModel(QtCore.QAbstractItemModel):
         """
         node = self.getNode(index)
         if isinstance(node, ElementNode):
-            self.beginInsertRows(index, node.childCount(), node.childCount())
+            headerIndex = self.childrenHeaderIndex(index)
+            row = self.rowCount(headerIndex)
+            self.beginInsertRows(headerIndex, row, row)
             node.addChildElement()
             self.endInsertRows()
 
@@ -166,35 +183,28 @@ class EtreeModel(QtCore.QAbstractItemModel):
         node = self.getNode(index)
         parentindex = self.parent(index)                        # get the parent QModelIndex
         parentnode = node.parent()                              # get the parent Node
-        if parentnode is not self._rootNode:
+        if isinstance(parentnode, ChildrenHeaderNode):
             row = node.row()
-            elementRow = node.elementRow()
-
-            # make the necessary changes to the etree
+            element = node.element
             newElement = etree.Element('NewElement')            # make the new etree element
-            newElementNode = ElementNode(newElement)            # make the new ElementNode
-            parentnode.element[elementRow] = newElement         # put the new element in position
-            newElement.append(node.element)                     # add the current element as a child
 
-            # make the necessary changes to the nodes
             self.beginRemoveRows(parentindex, row, row)
-            parentnode.removeChild(row)
+            parentnode.removeChildElement(row)                  # take the current element out of the etree
             self.endRemoveRows()
 
+            newElement.append(element)                          # add the current element as a child
             self.beginInsertRows(parentindex, row, row)
-            parentnode.insertChild(row, newElementNode)
-            newElementNode.addChild(node)
+            parentnode.insertChildElement(row, newElement)      # put the new element in position
             self.endInsertRows()
-        else:
+        elif parentnode is self._rootNode:
             # make the necessary changes to the etree
             newElement = etree.Element('NewElement')  # make the new etree element
-            newElementNode = ElementNode(newElement)  # make the new ElementNode
             newElement.append(node.element)           # add the current element as a child
             # make the necessary changes to the nodes
+            self.beginResetModel()
             self._rootNode.removeChild(0)
-            self._rootNode.addChild(newElementNode)
-            newElementNode.addChild(node)
-            self.reset()
+            self._rootNode.addChild(ElementNode(newElement))
+            self.endResetModel()
 
     def removeElement(self, index):
         """
@@ -203,15 +213,17 @@ class EtreeModel(QtCore.QAbstractItemModel):
         :return:
         """
         node = self.getNode(index)
-        if isinstance(node, ElementNode):
+        parent = node.parent()                      # parent node
+        if isinstance(node, ElementNode) and isinstance(parent, ChildrenHeaderNode):
+            parentindex = self.parent(index)        # get the parent QModelIndex
             row = node.row()                        # position of the node in its parent
-            elementrow = node.elementRow()          # position of the node's element in the parent's element
-            parent = node.parent()                  # parent node
-            childList = node.elementChildren        # save the list of all the element children under node
+            childList = list(node.element)          # save the list of all the child elements of node
             self.deleteElement(index)               # get rid of the element
-            for child in reversed(childList):       # loop through all the children in reverse order
-                parent.element.insert(elementrow, child.element)
-                parent.insertChild(row, child)
+            if childList:
+                self.beginInsertRows(parentindex, row, row + len(childList) - 1)
+                for i, child in enumerate(childList):
+                    parent.insertChildElement(row + i, child)
+                self.endInsertRows()
 
     def deleteElement(self, index):
         """
@@ -223,17 +235,151 @@ class EtreeModel(QtCore.QAbstractItemModel):
         if isinstance(node, ElementNode):
             parentindex = self.parent(index)        # get the parent QModelIndex
             parent = node.parent()                  # get the parent node
-            if parent is not self._rootNode:        # can't delete the last node
+            if isinstance(parent, ChildrenHeaderNode):  # can't delete the root element
                 row = node.row()
                 self.beginRemoveRows(parentindex, row, row)
                 parent.removeChildElement(row)
                 self.endRemoveRows()
 
+    def evictChildren(self, index):
+        """
+        drops the built child nodes under the element or children header referenced by index, and unpins the element
+        node itself, except for the nodes persistent indexes still refer to. they are built again from the etree when
+        needed.
+        :param index: QModelIndex
+        :return:
+        """
+        node = self.getNode(index)
+        inUse = self._nodesInUse()
+        if isinstance(node, ElementNode):
+            if isinstance(node.parent(), ChildrenHeaderNode) and node not in inUse:
+                node.parent().unpin(node)
+            node = node.childrenHeader()
+        if isinstance(node, ChildrenHeaderNode):
+            node.evict(inUse)
+
+    def _nodesInUse(self):
+        """
+        returns the nodes referenced by persistent indexes (e.g. the view's expanded and selected items), with all
+        their ancestors
+        :return: set of Node
+        """
+        nodes = set()
+        for index in self.persistentIndexList():
+            parentNode = index.internalPointer()
+            if isinstance(parentNode, ChildrenHeaderNode):
+                node = parentNode.pinnedChild(index.row())
+            else:
+                node = parentNode.child(index.row())
+            while node is not None and node not in nodes:
+                nodes.add(node)
+                node = node.parent()
+            node = parentNode
+            while node is not None and node not in nodes:
+                nodes.add(node)
+                node = node.parent()
+        return nodes
+
+    def copyElement(self, index):
+        """
+        returns a deep copy of the element referenced by index. the copy is made by lxml, and no nodes are built for it
+        :param index: QModelIndex
+        :return: etree.Element, or None if index does not reference an element
+        """
+        node = self.getNode(index)
+        if isinstance(node, ElementNode):
+            clone = copy.deepcopy(node.element)
+            clone.tail = None
+            return clone
+        return None
+
+    def pasteElements(self, index, elements):
+        """
+        adds the elements as children of the element referenced by index. all the rows are inserted at once, and no
+        nodes are built for them until their rows are needed.
+        :param index: QModelIndex
+        :param elements: list of etree.Element
+        :return:
+        """
+        node = self.getNode(index)
+        elements = [element for element in elements if isinstance(element, etree._Element)]
+        if isinstance(node, ElementNode) and elements:
+            headerIndex = self.childrenHeaderIndex(index)
+            header = node.childrenHeader()
+            first = header.childCount()
+            self.beginInsertRows(headerIndex, first, first + len(elements) - 1)
+            header.insertChildElements(first, elements)
+            self.endInsertRows()
+
+    def duplicateElement(self, index):
+        """
+        inserts a copy of the element referenced by index immediately after it
+        :param index: QModelIndex
+        :return:
+        """
+        node = self.getNode(index)
+        if isinstance(node, ElementNode):
+            parentindex = self.parent(index)
+            parent = node.parent()
+            if isinstance(parent, ChildrenHeaderNode):  # the root element can't have a sibling
+                row = node.row() + 1
+                clone = self.copyElement(index)
+                self.beginInsertRows(parentindex, row, row)
+                parent.insertChildElement(row, clone)
+                self.endInsertRows()
+
+    def mimeTypes(self):
+        return [self.elementMimeType]
+
+    def mimeData(self, indexes):
+        """
+        serializes the elements referenced by indexes, for the clipboard or drag and drop
+        :param indexes: list of QModelIndex
+        :return: QMimeData
+        """
+        nodes = []
+        for index in indexes:
+            node = self.getNode(index)
+            if isinstance(node, ElementNode) and node not in nodes:
+                nodes.append(node)
+        data = b''.join(etree.tostring(node.element, with_tail=False) for node in nodes)
+        mimeData = QtCore.QMimeData()
+        mimeData.setData(self.elementMimeType, QtCore.QByteArray(data))
+        return mimeData
+
+    def elementsFromMimeData(self, mimeData):
+        """
+        parses the elements serialized by mimeData()
+        :param mimeData: QMimeData
+        :return: list of etree.Element
+        """
+        if mimeData is None or not mimeData.hasFormat(self.elementMimeType):
+            return []
+        data = bytes(mimeData.data(self.elementMimeType))
+        try:
+            wrapper = etree.fromstring(b'<clipboard>' + data + b'</clipboard>')
+        except etree.XMLSyntaxError:
+            return []
+        return list(wrapper)
+
+    def childrenHeaderIndex(self, index):
+        """
+        returns the index of the children header of the element referenced by index
+        :param index: QModelIndex
+        :return: QModelIndex
+        """
+        node = self.getNode(index)
+        if isinstance(node, ElementNode):
+            return self.createIndex(node.childrenHeader().row(), 0, node)      # only for the model's use, not pinned
+        return QtCore.QModelIndex()
+
     def getNode(self, index):
         if index.isValid():
-            node = index.internalPointer()
-            if node:
-                return node
+            parentNode = index.internalPointer()
+            if parentNode:
+                node = parentNode.child(index.row())
+                if node:
+                    return node
         return self._rootNode
 
     def getXMLRoot(self):
@@ -242,6 +388,7 @@ class EtreeModel(QtCore.QAbstractItemModel):
     def setXMLRoot(self, root):
         if not isinstance(root, etree._Element):
             raise TypeError('must provide a root lxml.etree.element')
+        self.beginResetModel()
         self._rootNode.removeChild(0)
         self._rootNode.addChild(ElementNode(root))
-        self.reset()
+        self.endResetModel()
@@ -12,11 +12,13 @@ class XmlTreeView(QtGui.QTreeView):
         QtGui.QTreeView.__init__(self, parent)
         self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.setHeaderHidden(True)
+        self.setUniformRowHeights(True)         # otherwise the view measures rows all over large children headers
         self._delegate = TextEditDelegate()
         self.setItemDelegate(self._delegate)
         self.customContextMenuRequested.connect(self._menu)
         self.collapsed.connect(self.resizeColumns)
         self.expanded.connect(self.resizeColumns)
+        self.collapsed.connect(self._evict)
 
     def setModel(self, QAbstractItemModel):
         if isinstance(QAbstractItemModel, EtreeModel):
@@ -25,10 +27,18 @@ class XmlTreeView(QtGui.QTreeView):
     def resizeColumns(self):
         self.resizeColumnToContents(0)
 
+    def _evict(self, index):
+        """
+        drops the pages of child nodes under a collapsed children header
+        :param index: QModelIndex
+        :return:
+        """
+        self.model().evictChildren(index)
+
     def _menu(self, pos):
         index = self.indexAt(pos)
         if index.isValid():
-            node = index.internalPointer()
+            node = self.model().getNode(index)
             menu = QtGui.QMenu()
 
             removeAttribute = None
@@ -37,6 +47,10 @@ class XmlTreeView(QtGui.QTreeView):
             addParent = None
             remove = None
             delete = None
+            copy = None
+            cut = None
+            paste = None
+            duplicate = None
 
             if isinstance(node, AttributeNode):
                 removeAttribute = menu.addAction(self.tr('Remove Attribute'))
@@ -46,6 +60,13 @@ class XmlTreeView(QtGui.QTreeView):
                 addParent = menu.addAction(self.tr("Add Parent"))
                 remove = menu.addAction(self.tr("Remove"))
                 delete = menu.addAction(self.tr("Delete"))
+                menu.addSeparator()
+                copy = menu.addAction(self.tr("Copy"))
+                cut = menu.addAction(self.tr("Cut"))
+                cut.setEnabled(self.model().parent(index).isValid())     # the root element can't be removed
+                paste = menu.addAction(self.tr("Paste"))
+                paste.setEnabled(QtGui.QApplication.clipboard().mimeData().hasFormat(EtreeModel.elementMimeType))
+                duplicate = menu.addAction(self.tr("Duplicate"))
 
             foo = menu.exec_(self.viewport().mapToGlobal(pos))
             if foo is not None:
@@ -63,5 +84,31 @@ class XmlTreeView(QtGui.QTreeView):
                     self.model().removeElement(index)
                 elif foo is delete:
                     self.model().deleteElement(index)
+                elif foo is copy:
+                    self.copyElement(index)
+                elif foo is cut:
+                    self.copyElement(index)
+                    self.model().deleteElement(index)
+                elif foo is paste:
+                    self.pasteElements(index)
+                elif foo is duplicate:
+                    self.model().duplicateElement(index)
+
+    def copyElement(self, index):
+        """
+        puts the element referenced by index on the clipboard
+        :param index: QModelIndex
+        :return:
+        """
+        QtGui.QApplication.clipboard().setMimeData(self.model().mimeData([index]))
+
+    def pasteElements(self, index):
+        """
+        adds the elements on the clipboard as children of the element referenced by index
+        :param index: QModelIndex
+        :return:
+        """
+        elements = self.model().elementsFromMimeData(QtGui.QApplication.clipboard().mimeData())
+        self.model().pasteElements(index, elements)
 
 
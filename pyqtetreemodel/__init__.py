@@ -1,2 +1,3 @@
 from .Models import EtreeModel
 from .Widgets import XmlTreeView
+from .Async import AsyncEtreeModel
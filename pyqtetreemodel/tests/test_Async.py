@@ -0,0 +1,82 @@
+import asyncio
+import io
+from unittest import TestCase
+import pyqtgraph as pg
+from lxml import etree
+from pyqtetreemodel import EtreeModel, AsyncEtreeModel
+
+app = pg.mkQApp()
+
+
+class TestAsyncEtreeModel(TestCase):
+    def setUp(self):
+        self.model = EtreeModel(etree.Element('empty'))
+        self.asyncModel = AsyncEtreeModel(self.model)
+
+    def runAsync(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_load(self):
+        root = self.runAsync(self.asyncModel.load(io.BytesIO(b'<r><a/></r>')))
+        self.assertEqual(root.tag, 'r')
+        self.assertIs(self.model.getXMLRoot(), root)
+        self.assertEqual(self.model.rowCount(self.model.childrenHeaderIndex(self.model.index(0, 0))), 1)
+
+    def test_save(self):
+        target = io.BytesIO()
+        data = self.runAsync(self.asyncModel.save(target))
+        self.assertEqual(data, b'<empty/>')
+        self.assertEqual(target.getvalue(), b'<empty/>')
+
+    def test_xpath(self):
+        async def addAndQuery():
+            rootIndex = self.model.index(0, 0)
+            self.asyncModel.mutate(self.model.addChildElement, rootIndex)
+            self.asyncModel.mutate(self.model.addChildElement, rootIndex)
+            return await self.asyncModel.xpath('count(NewElement)')
+        self.assertEqual(self.runAsync(addAndQuery()), 2)
+
+    def test_mutateMany(self):
+        applied = []
+
+        async def mutate():
+            calls = [(applied.append, (i,)) for i in range(3)]
+            calls.append((dict, (), {'key': 'value'}))
+            return await self.asyncModel.mutateMany(calls)
+        self.assertEqual(self.runAsync(mutate()), [None, None, None, {'key': 'value'}])
+        self.assertEqual(applied, [0, 1, 2])
+
+    def test_mutateException(self):
+        async def fail():
+            def raiseError():
+                raise ValueError('bad mutation')
+            future = self.asyncModel.mutate(raiseError)
+            await self.asyncModel.flush()
+            return future
+        future = self.runAsync(fail())
+        self.assertIsInstance(future.exception(), ValueError)
+
+    def test_mutateDuringSave(self):
+        async def saveAndMutate():
+            save = asyncio.ensure_future(self.asyncModel.save())
+            await asyncio.sleep(0)                      # let the save start serializing
+            future = self.asyncModel.mutate(self.model.addChildElement, self.model.index(0, 0))
+            data = await save
+            await future
+            return data
+        self.assertEqual(self.runAsync(saveAndMutate()), b'<empty/>')
+        self.assertEqual(len(self.model.getXMLRoot()), 1)
+
+    def test_coalescedInserts(self):
+        inserted = []
+        self.model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+
+        async def insert():
+            rootIndex = self.model.index(0, 0)
+            for i in range(50):
+                self.asyncModel.mutate(self.model.addChildElement, rootIndex)
+            self.asyncModel.mutate(self.model.pasteElements, rootIndex, [etree.Element('pasted')])
+            await self.asyncModel.flush()
+        self.runAsync(insert())
+        self.assertEqual(inserted, [(0, 50)])
+        self.assertEqual(self.model.getXMLRoot()[50].tag, 'pasted')
@@ -0,0 +1,122 @@
+import time
+from unittest import TestCase
+import pyqtgraph as pg
+from pyqtgraph import QtCore
+from lxml import etree
+from pyqtetreemodel import EtreeModel, XmlTreeView
+
+app = pg.mkQApp()
+
+
+class TestEtreeModel(TestCase):
+    def test_pagedChildren(self):
+        root = etree.Element('root')
+        for i in range(100000):
+            etree.SubElement(root, 'child')
+        model = EtreeModel(root)
+        rootIndex = model.index(0, 0)
+        headerIndex = model.index(2, 0, rootIndex)
+        header = model.getNode(headerIndex)
+
+        view = XmlTreeView(None)
+        view.setModel(model)
+        view.resize(300, 400)
+        view.show()
+        view.expand(rootIndex)
+        app.processEvents()
+        start = time.time()
+        view.expand(headerIndex)
+        app.processEvents()
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(model.rowCount(headerIndex), 100000)
+        # resizeColumnToContents looks at up to 1000 rows
+        self.assertLessEqual(header.loadedCount, 1000)
+
+        scrollBar = view.verticalScrollBar()
+        for step in range(11):
+            scrollBar.setValue(scrollBar.maximum() * step // 10)
+            app.processEvents()
+        self.assertLessEqual(header.loadedCount, header.maxPages * header.pageSize)
+        self.assertIs(model.getNode(model.index(99999, 0, headerIndex)).element, root[99999])
+
+        view.collapse(headerIndex)
+        app.processEvents()
+        self.assertEqual(header.loadedCount, 0)
+        view.close()
+
+    def test_evictChildren(self):
+        root = etree.Element('root')
+        for i in range(5000):
+            etree.SubElement(root, 'child')
+        model = EtreeModel(root)
+        headerIndex = model.childrenHeaderIndex(model.index(0, 0))
+        header = model.getNode(headerIndex)
+        for row in range(5000):
+            model.index(0, 0, model.index(row, 0, headerIndex))       # pins the child nodes
+        self.assertEqual(header.loadedCount, 5000)
+        kept = QtCore.QPersistentModelIndex(model.index(0, 0, model.index(10, 0, headerIndex)))
+        model.evictChildren(headerIndex)
+        self.assertEqual(header.loadedCount, 1)
+        self.assertEqual(model.getNode(kept.parent()).row(), 10)
+        del kept
+        model.evictChildren(headerIndex)
+        self.assertEqual(header.loadedCount, 0)
+
+
+class TestEtreeModelEditing(TestCase):
+    def setUp(self):
+        self.root = etree.fromstring('<r><a x="1"><b/></a><c/></r>')
+        self.model = EtreeModel(self.root)
+        self.rootIndex = self.model.index(0, 0)
+        self.headerIndex = self.model.childrenHeaderIndex(self.rootIndex)
+        self.aIndex = self.model.index(0, 0, self.headerIndex)
+        self.cIndex = self.model.index(1, 0, self.headerIndex)
+
+    def childTags(self, index):
+        headerIndex = self.model.childrenHeaderIndex(index)
+        return [self.model.getNode(self.model.index(row, 0, headerIndex)).element.tag
+                for row in range(self.model.rowCount(headerIndex))]
+
+    def test_copyElement(self):
+        clone = self.model.copyElement(self.aIndex)
+        self.assertIsNot(clone, self.root[0])
+        self.assertIsNone(clone.getparent())
+        self.assertEqual(etree.tostring(clone), etree.tostring(self.root[0]))
+
+    def test_pasteElements(self):
+        self.model.pasteElements(self.cIndex, [self.model.copyElement(self.aIndex)])
+        self.assertEqual(self.model.rowCount(self.cIndex), 3)      # only the header rows
+        self.assertEqual(self.childTags(self.cIndex), ['a'])
+        self.assertEqual(self.childTags(self.rootIndex), ['a', 'c'])
+        self.assertEqual(etree.tostring(self.root), b'<r><a x="1"><b/></a><c><a x="1"><b/></a></c></r>')
+
+    def test_pasteManyElements(self):
+        elements = [etree.Element('p%d' % i) for i in range(2000)]
+        start = time.time()
+        self.model.pasteElements(self.cIndex, elements)
+        self.assertLess(time.time() - start, 1)
+        header = self.model.getNode(self.model.childrenHeaderIndex(self.cIndex))
+        self.assertEqual(header.loadedCount, 0)
+        self.assertEqual(self.childTags(self.cIndex)[1999], 'p1999')
+        self.assertEqual(len(self.root[1]), 2000)
+
+    def test_duplicateElement(self):
+        self.model.duplicateElement(self.aIndex)
+        self.assertEqual(self.childTags(self.rootIndex), ['a', 'a', 'c'])
+        self.assertIsNot(self.root[0], self.root[1])
+        self.assertIs(self.model.getNode(self.model.index(1, 0, self.headerIndex)).element, self.root[1])
+        self.model.duplicateElement(self.rootIndex)
+        self.assertEqual(self.model.rowCount(QtCore.QModelIndex()), 1)
+
+    def test_mimeData(self):
+        mimeData = self.model.mimeData([self.aIndex, self.cIndex, self.aIndex])
+        elements = self.model.elementsFromMimeData(mimeData)
+        self.assertEqual([element.tag for element in elements], ['a', 'c'])
+        self.assertEqual(etree.tostring(elements[0]), etree.tostring(self.root[0]))
+        self.assertEqual(self.model.elementsFromMimeData(QtCore.QMimeData()), [])
+
+    def test_deleteElement(self):
+        self.model.deleteElement(self.aIndex)
+        self.assertEqual(self.childTags(self.rootIndex), ['c'])
+        self.model.deleteElement(self.rootIndex)
+        self.assertIs(self.model.getXMLRoot(), self.root)
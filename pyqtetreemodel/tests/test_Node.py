@@ -1,7 +1,73 @@
 from unittest import TestCase
+from lxml import etree
 import pyqtetreemodel
+from pyqtetreemodel.Data import ElementNode, ChildrenHeaderNode
 
 
 class TestNode(TestCase):
     def test_Node(self):
         pass
+
+    def test_ChildrenHeaderNode_lazy(self):
+        root = etree.Element('root')
+        for i in range(3):
+            etree.SubElement(root, 'child%d' % i)
+        node = ElementNode(root)
+        header = [child for child in node.children if isinstance(child, ChildrenHeaderNode)][0]
+        self.assertEqual(header.childCount(), 3)
+        self.assertEqual(header.loadedCount, 0)
+        self.assertEqual(header.child(1).element.tag, 'child1')
+        self.assertEqual(header.child(1).row(), 1)
+        self.assertEqual(header.loadedCount, 3)
+
+    def test_ElementNode_prefixedTag(self):
+        root = etree.fromstring('<a:root xmlns:a="urn:a"><a:child/></a:root>')
+        node = ElementNode(root[0])
+        self.assertEqual(node.displayTag(), 'a:child')
+        self.assertTrue(node.setData(0, 'a:renamed'))
+        self.assertEqual(root[0].tag, '{urn:a}renamed')
+        self.assertFalse(node.setData(0, 'unknown:renamed'))
+
+    def test_ChildrenHeaderNode_paging(self):
+        root = etree.Element('root')
+        for i in range(25):
+            etree.SubElement(root, 'child%d' % i)
+        header = ChildrenHeaderNode(parent=ElementNode(root))
+        header.pageSize = 10
+        header.maxPages = 2
+        pinned = header.child(0)
+        header.pin(pinned)
+        self.assertEqual(header.childCount(), 25)
+        self.assertEqual(header.loadedCount, 10)
+        self.assertEqual(header.child(24).element.tag, 'child24')
+        self.assertEqual(header.loadedCount, 15)
+        header.child(15)                                # drops the first page, except the pinned node
+        self.assertEqual(header.loadedCount, 16)
+        self.assertIs(header.child(0), pinned)
+        header.evict({pinned})
+        self.assertEqual(header.loadedCount, 1)
+        header.evict(set())
+        self.assertEqual(header.loadedCount, 0)
+
+    def test_ChildrenHeaderNode_insertRemove(self):
+        root = etree.Element('root')
+        for i in range(25):
+            etree.SubElement(root, 'child%d' % i)
+        header = ChildrenHeaderNode(parent=ElementNode(root))
+        header.pageSize = 10
+        pinned = header.child(15)
+        header.pin(pinned)
+        header.insertChildElement(12, etree.Element('new'))
+        self.assertEqual(header.childCount(), 26)
+        self.assertEqual(pinned.row(), 16)
+        self.assertIs(header.child(16), pinned)
+        self.assertEqual(header.child(12).element.tag, 'new')
+        self.assertEqual(header.child(25).element.tag, 'child24')
+        header.removeChildElement(0)
+        self.assertEqual(header.childCount(), 25)
+        self.assertEqual(pinned.row(), 15)
+        self.assertEqual(header.child(0).element.tag, 'child1')
+        self.assertEqual([child.tag for child in root][11], 'new')
+        header.removeChildElement(15)
+        self.assertIsNone(pinned.parent())
+        self.assertEqual(header.child(15).element.tag, 'child16')
@@ -15,6 +15,7 @@ setup(name='pyqtetreemodel',
       author_email='jholt1978@gmail.com',
       license='MIT',
       packages=['pyqtetreemodel'],
+      python_requires='>=3.7',
       install_requires=[
           'pyqtgraph',
           'lxml',